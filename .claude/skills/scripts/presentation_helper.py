@@ -3,6 +3,8 @@
 京都プレゼンテーションテンプレートを使用してスライドを作成するヘルパー関数
 """
 
+import weakref
+
 from pptx import Presentation
 from pathlib import Path
 
@@ -20,20 +22,51 @@ def create_presentation_from_template(template_path: str) -> Presentation:
     return Presentation(template_path)
 
 
+# プレゼンテーションごとの「小文字レイアウト名 → レイアウトインデックス」の索引
+# （レイアウトオブジェクトはプレゼンテーションを参照するため、値には整数のみを持つ）
+_layout_index_cache = weakref.WeakKeyDictionary()
+
+
+def _layout_index(prs: Presentation) -> dict:
+    """
+    小文字のレイアウト名をキーにした索引を取得（プレゼンテーションごとに1度だけ作成）
+    
+    Args:
+        prs: プレゼンテーションオブジェクト
+        
+    Returns:
+        dict: 小文字レイアウト名 → レイアウトインデックス（同名の場合は先頭のもの）
+    """
+    index = _layout_index_cache.get(prs.part)
+    if index is None:
+        index = {}
+        for i, layout in enumerate(prs.slide_layouts):
+            index.setdefault(layout.name.lower(), i)
+        _layout_index_cache[prs.part] = index
+    return index
+
+
 def get_layout_by_name(prs: Presentation, layout_name: str):
     """
     レイアウト名からレイアウトオブジェクトを取得
     
     Args:
         prs: プレゼンテーションオブジェクト
-        layout_name: レイアウト名（部分一致も可）
+        layout_name: レイアウト名（完全一致を優先し、なければ部分一致）
         
     Returns:
         レイアウトオブジェクト、見つからない場合はNone
     """
-    for layout in prs.slide_layouts:
-        if layout_name.lower() in layout.name.lower():
-            return layout
+    index = _layout_index(prs)
+    key = layout_name.lower()
+
+    layout_idx = index.get(key)
+    if layout_idx is not None:
+        return prs.slide_layouts[layout_idx]
+
+    for name, layout_idx in index.items():
+        if key in name:
+            return prs.slide_layouts[layout_idx]
     return None
 
 
@@ -2,24 +2,53 @@
 スライド作成アプリ - FastAPI Backend
 ES入力 → AI構成案生成 → チャット編集 → PPTX出力
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import BackgroundTasks, FastAPI, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.responses import FileResponse, Response
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Tuple, Union
 from pptx import Presentation
 from pptx.util import Inches, Pt
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import nsdecls
+import io
 import os
-import uuid
+import re
+import time
+import base64
+import struct
+import functools
+import itertools
+import asyncio
+import hashlib
+from collections import OrderedDict
 from datetime import datetime
-from anthropic import Anthropic
-import json
+from xml.sax.saxutils import escape as xml_escape
+import importlib.util
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient, Timeout
+import orjson
 from dotenv import load_dotenv
 
 # .envファイルを読み込み
 load_dotenv()
 
-app = FastAPI(title="Slide Creator App")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """起動時・終了時の処理"""
+    # 起動時：既存のエクスポートファイルと意味的キャッシュを読み込む
+    _load_export_index()
+    _load_semantic_cache()
+    yield
+    # 終了時：意味的キャッシュを保存し、Anthropic クライアントの接続プールを閉じる
+    _save_semantic_cache()
+    if anthropic_client is not None:
+        await anthropic_client.close()
+
+
+app = FastAPI(title="Slide Creator App", lifespan=lifespan)
 
 # 静的ファイル配信
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -28,17 +57,79 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 EXPORT_DIR = "exports"
 os.makedirs(EXPORT_DIR, exist_ok=True)
 
+# エクスポートファイルの保持上限（超えたら最も長く使われていないファイルを削除）
+EXPORT_MAX_FILES = 200
+_export_lru: "OrderedDict[str, float]" = OrderedDict()
+_export_lock = asyncio.Lock()
+
+# エクスポートファイル名用の連番（起動時刻から開始し、プロセスIDと組み合わせて一意にする）
+_export_counter = itertools.count(int(time.time()))
+_export_pid_suffix = os.getpid() & 0xFFFF
+_EXPORT_FILENAME_RE = re.compile(r"slide_([a-z2-7]{10})\.pptx")
+
+# Anthropic API のタイムアウト
+# デッキ全体生成やPPTX設定生成は出力が長いため、読み込みはSDK既定の600秒のまま、接続のみ短くする
+ANTHROPIC_TIMEOUT = Timeout(600.0, connect=5.0)
+
 # Anthropic クライアント初期化
+# 並列リクエストを1本の接続に多重化できるよう、h2がインストールされていればHTTP/2を使う
+# （接続プールの上限はSDK既定値を使う）
 anthropic_client = None
 try:
     api_key = os.getenv("ANTHROPIC_API_KEY")
     if api_key and api_key != "your_api_key_here":
-        anthropic_client = Anthropic(api_key=api_key)
+        http_client = DefaultAsyncHttpxClient(
+            http2=importlib.util.find_spec("h2") is not None
+        )
+        anthropic_client = AsyncAnthropic(
+            api_key=api_key,
+            http_client=http_client,
+            timeout=ANTHROPIC_TIMEOUT
+        )
 except Exception as e:
     print(f"Warning: Anthropic client initialization failed: {e}")
     print("Falling back to rule-based slide generation")
 
 
+# ボディ生成の同時リクエスト数上限
+BODY_GENERATION_CONCURRENCY = 8
+
+# /generate の完全一致キャッシュ（同一入力の再送信でLLM呼び出しを省略）
+GENERATE_CACHE_MAX = 256
+GENERATE_CACHE_DIR = os.path.join(".cache", "generate")
+_gen_cache: "OrderedDict[str, list]" = OrderedDict()
+
+# ディスクキャッシュ（diskcacheがインストールされている場合のみ、再起動後も保持）
+_gen_disk_cache = None
+try:
+    import diskcache
+    _gen_disk_cache = diskcache.Cache(GENERATE_CACHE_DIR)
+except ImportError:
+    pass
+except Exception as e:
+    print(f"Warning: Disk cache initialization failed: {e}")
+
+# /generate の意味的キャッシュ（言い回しが少し違うだけの入力でもLLM呼び出しを省略）
+# numpy と sentence-transformers がインストールされている場合のみ有効
+SEMANTIC_CACHE_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+SEMANTIC_CACHE_THRESHOLD = 0.93
+SEMANTIC_CACHE_MAX = 1000
+SEMANTIC_CACHE_DIR = os.path.join(".cache", "semantic")
+SEMANTIC_CACHE_ENABLED = False
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+    SEMANTIC_CACHE_ENABLED = True
+except ImportError:
+    pass
+
+_sem_embeddings = None  # 正規化済み埋め込み行列 (N, dim)
+_sem_titles: List[list] = []  # 各行に対応する入力セクションのタイトル
+_sem_slides: List[list] = []  # 各行に対応するスライドデータ
+_sem_last_used: List[int] = []  # LRU用の最終参照時刻（論理クロック）
+_sem_clock = 0
+
+
 # データモデル
 class Section(BaseModel):
     """ES入力のセクション"""
@@ -57,6 +148,10 @@ class SlidesState(BaseModel):
     slides: List[Slide]
 
 
+# スライド配列の一括バリデーション用
+_SLIDE_LIST = TypeAdapter(List[Slide])
+
+
 class GenerateRequest(BaseModel):
     """構成案生成リクエスト"""
     sections: List[Section]
@@ -80,26 +175,35 @@ async def root():
     return FileResponse("static/index.html")
 
 
+def format_sections(sections: List[Section]) -> str:
+    """入力セクションをプロンプト用のテキストに整形"""
+    return "\n\n".join([
+        f"【{section.title}】\n{section.content}"
+        for section in sections
+    ])
+
+
+# LLMレスポンス中のコードブロック（```json ... ```）を抽出する正規表現
+_JSON_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+
+
+def _extract_json(content: str) -> str:
+    """LLMレスポンスからJSON部分を抽出（コードブロックがなければ全体を返す）"""
+    match = _JSON_FENCE_RE.search(content)
+    return match.group(1).strip() if match else content.strip()
+
+
 class MessageLineSlide(BaseModel):
     """メッセージラインとタイトルのみを含むスライド"""
     title: str
     message_line: str  # 40文字以内の核心メッセージ
 
 
-async def generate_message_lines(sections: List[Section]) -> List[MessageLineSlide]:
-    """
-    Step1: メッセージラインを生成する
-    各スライドの核心メッセージ（1~2行・80文字以内）とタイトルを決定
-    """
-    sections_text = "\n\n".join([
-        f"【{section.title}】\n{section.content}"
-        for section in sections
-    ])
+_MESSAGE_LINE_LIST = TypeAdapter(List[MessageLineSlide])
 
-    prompt = f"""以下の自己PR・ES情報を分析し、効果的なプレゼンテーションスライドのメッセージラインを決定してください。
 
-# 入力情報
-{sections_text}
+# Step1用の静的プロンプト（プレフィックスキャッシュを効かせるため毎回同一バイト列で送る）
+MESSAGE_LINE_SYSTEM_PROMPT = """与えられた自己PR・ES情報を分析し、効果的なプレゼンテーションスライドのメッセージラインを決定してください。
 
 # 要件
 1. 入力情報全体を分析し、各スライドの核心メッセージを1~2行で定義（80文字以内）
@@ -113,177 +217,542 @@ async def generate_message_lines(sections: List[Section]) -> List[MessageLineSli
 以下のJSON配列形式で返してください：
 
 ```json
-{{
+{
   "slides": [
-    {{
+    {
       "title": "スライドのタイトル",
       "message_line": "核心メッセージ（80文字以内）"
-    }}
+    }
   ]
-}}
+}
 ```
 
 JSON配列のみを返してください（説明文は不要）。"""
 
-    try:
-        response = anthropic_client.messages.create(
+
+# Step2用の静的プロンプト
+SLIDE_BODY_SYSTEM_PROMPT = """元データ（入力情報）とスライドの情報を基に、スライドのボディ部分を生成してください。
+
+# 要件
+1. スライドのメッセージラインを裏付ける情報を元データから抽出
+2. 元データに記載されている具体的な根拠・事例・データを優先的に使用
+3. 3-5個の箇条書きで構成（各項目は30文字以内が目安）
+4. 元データにない情報は極力避け、入力情報に忠実に基づく
+5. 以下の順序で構成：
+   - 1つ目: 元データからの根拠・背景情報
+   - 2つ目: 元データからの具体例・データ
+   - 3つ目: メッセージラインを補足する詳細説明
+   - 4つ目以降: （必要に応じて）行動項目や検討ポイント
+
+generate_slide_bodyツールを使用してボディを生成してください。"""
+
+
+# 動的部分のテンプレート（静的部分と分けて、差し込む値だけを毎回埋め込む）
+MESSAGE_LINE_INPUT_TEMPLATE = "# 入力情報\n{sections_text}"
+SLIDE_BODY_SOURCE_TEMPLATE = "# 元データ（入力情報）\n{sections_text}"
+SLIDE_BODY_SLIDE_TEMPLATE = """# このスライドの情報
+- タイトル: {title}
+- メッセージライン: {message_line}"""
+
+
+# Skills（tools）の定義：ボディ生成用の構造化出力スキーマ
+SLIDE_BODY_TOOL = {
+    "name": "generate_slide_body",
+    "description": "メッセージラインに基づいて、元データからボディ部分を抽出・生成する",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "bullets": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "メッセージラインを裏付ける箇条書き（3-5個）。元データから具体的な根拠・事例・データを引用"
+            }
+        },
+        "required": ["bullets"]
+    }
+}
+
+
+# 1回の呼び出しでデッキ全体を生成する場合の静的プロンプト
+DECK_SYSTEM_PROMPT = """与えられた自己PR・ES情報を分析し、効果的なプレゼンテーションスライドを作成してください。
+
+# 要件
+1. 入力情報全体を分析し、各スライドの核心メッセージ（メッセージライン）を1~2行で定義（80文字以内）
+2. メッセージラインは事実と示唆を統合した形で記述（プレフィックス不要）
+3. 最初のスライドはタイトルスライド（全体の目的を明示）
+4. 最後にまとめスライド（結論と次アクション）
+5. 全体で5-8枚程度のスライド
+6. 情報を適切にグループ化し、ストーリー性を持たせる
+7. 各スライドのボディはメッセージラインを裏付ける3-5個の箇条書き（各項目は30文字以内が目安）
+8. ボディは元データに記載されている具体的な根拠・事例・データを優先的に使用し、元データにない情報は極力避ける
+9. ボディは以下の順序で構成：
+   - 1つ目: 元データからの根拠・背景情報
+   - 2つ目: 元データからの具体例・データ
+   - 3つ目: メッセージラインを補足する詳細説明
+   - 4つ目以降: （必要に応じて）行動項目や検討ポイント
+
+generate_deckツールを使用してスライドを生成してください。"""
+
+
+# デッキ全体生成の出力上限（8枚 × 箇条書き5個でも収まるよう余裕を持たせる）
+DECK_MAX_TOKENS = 8000
+
+
+# Skills（tools）の定義：デッキ全体の構造化出力スキーマ
+DECK_TOOL = {
+    "name": "generate_deck",
+    "description": "入力情報からスライド全体（タイトル・メッセージライン・ボディ）を生成する",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "slides": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "title": {"type": "string", "description": "スライドのタイトル"},
+                        "message_line": {
+                            "type": "string",
+                            "maxLength": 80,
+                            "description": "核心メッセージ（80文字以内）"
+                        },
+                        "body_bullets": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "minItems": 3,
+                            "maxItems": 5,
+                            "description": "メッセージラインを裏付ける箇条書き（3-5個）。元データから具体的な根拠・事例・データを引用"
+                        }
+                    },
+                    "required": ["title", "message_line", "body_bullets"]
+                }
+            }
+        },
+        "required": ["slides"]
+    }
+}
+
+
+async def stream_message_lines(sections_text: str) -> AsyncIterator[MessageLineSlide]:
+    """
+    Step1: メッセージラインをストリーミングで生成する
+    各スライドの核心メッセージ（1~2行・80文字以内）とタイトルを決定し、
+    "slides"配列の要素が閉じた時点で1枚ずつ返す
+    """
+    buffer = ""
+    pos = 0
+    depth = 0
+    in_string = False
+    escaped = False
+    obj_start = -1
+    emitted = 0
+
+    async with anthropic_client.messages.stream(
+        model="claude-haiku-4-5-20251001",
+        max_tokens=2000,
+        system=[
+            {
+                "type": "text",
+                "text": MESSAGE_LINE_SYSTEM_PROMPT,
+                "cache_control": {"type": "ephemeral"}
+            }
+        ],
+        messages=[
+            {"role": "user", "content": MESSAGE_LINE_INPUT_TEMPLATE.format(sections_text=sections_text)}
+        ]
+    ) as stream:
+        async for text in stream.text_stream:
+            buffer += text
+
+            # 前回の続きから走査し、{"slides": [ {...}, ... ]} の要素が閉じたら取り出す
+            while pos < len(buffer):
+                char = buffer[pos]
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif char == "\\":
+                        escaped = True
+                    elif char == '"':
+                        in_string = False
+                elif char == '"':
+                    in_string = True
+                elif char in "{[":
+                    if char == "{" and depth == 2:
+                        obj_start = pos
+                    depth += 1
+                elif char in "}]":
+                    depth -= 1
+                    if char == "}" and depth == 2 and obj_start >= 0:
+                        yield MessageLineSlide(**orjson.loads(buffer[obj_start:pos + 1]))
+                        emitted += 1
+                        obj_start = -1
+                pos += 1
+
+    # 想定外の形式で1枚も取り出せなかった場合はレスポンス全体をパース
+    if emitted == 0:
+        data = orjson.loads(_extract_json(buffer))
+        for message_line in _MESSAGE_LINE_LIST.validate_python(data.get("slides", [])):
+            yield message_line
+
+
+def _build_source_block(sections_text: str) -> dict:
+    """Step2で全スライド共通の元データ部分（2枚目以降はキャッシュヒットする）"""
+    return {
+        "type": "text",
+        "text": SLIDE_BODY_SOURCE_TEMPLATE.format(sections_text=sections_text),
+        "cache_control": {"type": "ephemeral"}
+    }
+
+
+async def generate_slide_body(
+    msg_slide: MessageLineSlide,
+    source_block: dict,
+    semaphore: asyncio.Semaphore
+) -> Optional[Slide]:
+    """
+    Step2: Claude Skills（tools）を使用して1枚分のボディ部分を生成
+    メッセージラインと元データから、スライドテンプレートに従ってボディを抽出・生成
+    Toolsの結果が得られなかった場合はNoneを返す
+    """
+    slide_block = {
+        "type": "text",
+        "text": SLIDE_BODY_SLIDE_TEMPLATE.format(
+            title=msg_slide.title,
+            message_line=msg_slide.message_line
+        )
+    }
+
+    async with semaphore:
+        response = await anthropic_client.messages.create(
             model="claude-sonnet-4-20250514",
             max_tokens=2000,
+            system=[
+                {
+                    "type": "text",
+                    "text": SLIDE_BODY_SYSTEM_PROMPT,
+                    "cache_control": {"type": "ephemeral"}
+                }
+            ],
             messages=[
-                {"role": "user", "content": prompt}
-            ]
+                {"role": "user", "content": [source_block, slide_block]}
+            ],
+            tools=[SLIDE_BODY_TOOL],
+            tool_choice={"type": "tool", "name": "generate_slide_body"}
         )
 
-        # レスポンスからJSONを抽出
-        content = response.content[0].text
+    # Toolsの結果を取得
+    if response.content and len(response.content) > 0:
+        tool_result = response.content[0]
+        if hasattr(tool_result, 'type') and tool_result.type == "tool_use":
+            if tool_result.name == "generate_slide_body":
+                # inputはdictまたは適切な形式で提供される
+                if isinstance(tool_result.input, dict):
+                    body_bullets = tool_result.input.get("bullets", [])
+                else:
+                    # フォールバック: inputがdictでない場合
+                    body_bullets = getattr(tool_result.input, "bullets", [])
+
+                # メッセージラインを先頭に追加
+                full_bullets = [msg_slide.message_line] + body_bullets
+
+                return Slide(
+                    title=msg_slide.title,
+                    bullets=full_bullets
+                )
+            # 想定外のtool名
+            print(f"Warning: Unexpected tool name '{tool_result.name}'")
+
+    return None
+
+
+def _collect_slide_bodies(
+    message_line_slides: List[MessageLineSlide],
+    results: list
+) -> Tuple[List[Slide], bool]:
+    """
+    ボディ生成結果をまとめる
+
+    Returns:
+        スライドのリストと、全スライドのボディを生成できたかどうか
+        （失敗したスライドはメッセージラインのみ、Tools未使用のスライドは仮の箇条書きで補う）
+    """
+    all_slides = []
+    complete = True
+    for msg_slide, result in zip(message_line_slides, results):
+        if isinstance(result, Exception):
+            print(f"Body generation error for slide '{msg_slide.title}': {result}")
+            # エラー時はメッセージラインのみでスライドを作成
+            all_slides.append(Slide(
+                title=msg_slide.title,
+                bullets=[msg_slide.message_line]
+            ))
+            complete = False
+        elif result is None:
+            # Toolsが使えない場合のフォールバック
+            print(f"Warning: Tools not used for slide '{msg_slide.title}', using fallback")
+            all_slides.append(Slide(
+                title=msg_slide.title,
+                bullets=[msg_slide.message_line, "詳細情報を元データから抽出してください"]
+            ))
+            complete = False
+        else:
+            all_slides.append(result)
 
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0].strip()
-        elif "```" in content:
-            content = content.split("```")[1].split("```")[0].strip()
+    return all_slides, complete
 
-        # JSONをパース
-        data = json.loads(content)
-        message_lines = [MessageLineSlide(**slide) for slide in data.get("slides", [])]
-        return message_lines
 
+async def generate_deck(sections_text: str) -> Optional[List[Slide]]:
+    """
+    1回のLLM呼び出しでスライド全体（タイトル・メッセージライン・ボディ）を生成
+    Toolsの結果が得られなかった場合や出力が途中で打ち切られた場合はNoneを返す
+    """
+    try:
+        response = await anthropic_client.messages.create(
+            model="claude-sonnet-4-20250514",
+            max_tokens=DECK_MAX_TOKENS,
+            system=[
+                {
+                    "type": "text",
+                    "text": DECK_SYSTEM_PROMPT,
+                    "cache_control": {"type": "ephemeral"}
+                }
+            ],
+            messages=[
+                {"role": "user", "content": MESSAGE_LINE_INPUT_TEMPLATE.format(sections_text=sections_text)}
+            ],
+            tools=[DECK_TOOL],
+            tool_choice={"type": "tool", "name": "generate_deck"}
+        )
     except Exception as e:
+        print(f"Deck generation error: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"スライド生成中にエラーが発生しました: {str(e)}"
+        )
+
+    # 出力上限に達した場合はtool入力が途中で切れている可能性がある
+    if response.stop_reason == "max_tokens":
+        print("Warning: Deck generation hit max_tokens, falling back to two-stage generation")
+        return None
+
+    # Toolsの結果を取得
+    for block in response.content:
+        if getattr(block, "type", None) == "tool_use" and block.name == "generate_deck":
+            deck = block.input if isinstance(block.input, dict) else {}
+            slides_data = deck.get("slides", [])
+            if slides_data:
+                # tool入力はスキーマ通りとは限らないため、想定外の形式なら2段階生成に任せる
+                try:
+                    # メッセージラインを先頭に追加
+                    return _SLIDE_LIST.validate_python([
+                        {
+                            "title": slide.get("title", ""),
+                            "bullets": [slide.get("message_line", "")] + slide.get("body_bullets", [])
+                        }
+                        for slide in slides_data
+                    ])
+                except (TypeError, AttributeError, ValidationError) as e:
+                    print(f"Warning: Invalid deck tool input, falling back to two-stage generation: {e}")
+                    return None
+
+    print("Warning: Tools not used for deck generation, falling back to two-stage generation")
+    return None
+
+
+async def generate_slides_with_llm(sections: List[Section]) -> Tuple[List[Slide], bool]:
+    """
+    LLMを使用してスライド構成を生成
+    通常は1回の呼び出しでデッキ全体を生成し、
+    Toolsの結果が得られなかった場合のみ2段階アプローチにフォールバックする
+    Step1: メッセージライン生成（ストリーミング）
+    Step2: Skills機能でボディ生成（確定したメッセージラインから順に開始）
+
+    Returns:
+        スライドのリストと、フォールバックなしで全スライドを生成できたかどうか
+    """
+    sections_text = format_sections(sections)
+
+    slides = await generate_deck(sections_text)
+    if slides is not None:
+        return slides, True
+
+    source_block = _build_source_block(sections_text)
+    semaphore = asyncio.Semaphore(BODY_GENERATION_CONCURRENCY)
+    message_line_slides = []
+    tasks = []
+
+    try:
+        # Step1の完了を待たず、メッセージラインが1枚確定するごとにStep2を開始
+        async for msg_slide in stream_message_lines(sections_text):
+            message_line_slides.append(msg_slide)
+            tasks.append(asyncio.create_task(
+                generate_slide_body(msg_slide, source_block, semaphore)
+            ))
+    except Exception as e:
+        for task in tasks:
+            task.cancel()
         print(f"Message line generation error: {e}")
         raise HTTPException(
             status_code=500,
             detail=f"メッセージライン生成中にエラーが発生しました: {str(e)}"
         )
 
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    return _collect_slide_bodies(message_line_slides, results)
 
-async def generate_slide_bodies_with_skills(
-    message_line_slides: List[MessageLineSlide],
-    sections: List[Section]
-) -> List[Slide]:
-    """
-    Step2: Claude Skills（tools）を使用してボディ部分を生成
-    メッセージラインと元データから、スライドテンプレートに従ってボディを抽出・生成
-    """
-    sections_text = "\n\n".join([
-        f"【{section.title}】\n{section.content}"
-        for section in sections
-    ])
 
-    # Skills（tools）の定義：ボディ生成用の構造化出力スキーマ
-    slide_body_tool = {
-        "name": "generate_slide_body",
-        "description": "メッセージラインに基づいて、元データからボディ部分を抽出・生成する",
-        "input_schema": {
-            "type": "object",
-            "properties": {
-                "bullets": {
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "メッセージラインを裏付ける箇条書き（3-5個）。元データから具体的な根拠・事例・データを引用"
-                }
-            },
-            "required": ["bullets"]
-        }
-    }
+def _generate_cache_key(sections: List[Section]) -> str:
+    """入力セクションからキャッシュキーを生成"""
+    payload = orjson.dumps(
+        [section.model_dump() for section in sections],
+        option=orjson.OPT_SORT_KEYS
+    )
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
 
-    all_slides = []
 
-    # 各メッセージラインに対してボディを生成
-    for msg_slide in message_line_slides:
-        prompt = f"""以下の情報を基に、スライドのボディ部分を生成してください。
+def _get_cached_slides(key: str) -> Optional[List[Slide]]:
+    """キャッシュからスライドを取得（メモリ → ディスクの順に参照）"""
+    if key in _gen_cache:
+        _gen_cache.move_to_end(key)
+        return _gen_cache[key]
 
-# 元データ（入力情報）
-{sections_text}
+    if _gen_disk_cache is not None:
+        slides_data = _gen_disk_cache.get(key)
+        if slides_data is not None:
+            slides = _SLIDE_LIST.validate_python(slides_data)
+            _set_cached_slides(key, slides, persist=False)
+            return slides
 
-# このスライドの情報
-- タイトル: {msg_slide.title}
-- メッセージライン: {msg_slide.message_line}
+    return None
 
-# 要件
-1. メッセージライン「{msg_slide.message_line}」を裏付ける情報を元データから抽出
-2. 元データに記載されている具体的な根拠・事例・データを優先的に使用
-3. 3-5個の箇条書きで構成（各項目は30文字以内が目安）
-4. 元データにない情報は極力避け、入力情報に忠実に基づく
-5. 以下の順序で構成：
-   - 1つ目: 元データからの根拠・背景情報
-   - 2つ目: 元データからの具体例・データ
-   - 3つ目: メッセージラインを補足する詳細説明
-   - 4つ目以降: （必要に応じて）行動項目や検討ポイント
 
-generate_slide_bodyツールを使用してボディを生成してください。"""
+def _set_cached_slides(key: str, slides: List[Slide], persist: bool = True) -> None:
+    """スライドをキャッシュに保存（上限を超えたら最も古いものを破棄）"""
+    _gen_cache[key] = slides
+    _gen_cache.move_to_end(key)
+    if len(_gen_cache) > GENERATE_CACHE_MAX:
+        _gen_cache.popitem(last=False)
 
-        try:
-            response = anthropic_client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=2000,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                tools=[slide_body_tool],
-                tool_choice={"type": "tool", "name": "generate_slide_body"}
-            )
-
-            # Toolsの結果を取得
-            if response.content and len(response.content) > 0:
-                tool_result = response.content[0]
-                if hasattr(tool_result, 'type') and tool_result.type == "tool_use":
-                    if tool_result.name == "generate_slide_body":
-                        # inputはdictまたは適切な形式で提供される
-                        if isinstance(tool_result.input, dict):
-                            body_bullets = tool_result.input.get("bullets", [])
-                        else:
-                            # フォールバック: inputがdictでない場合
-                            body_bullets = getattr(tool_result.input, "bullets", [])
-                        
-                        # メッセージラインを先頭に追加
-                        full_bullets = [msg_slide.message_line] + body_bullets
-                        
-                        all_slides.append(Slide(
-                            title=msg_slide.title,
-                            bullets=full_bullets
-                        ))
-                    else:
-                        # 想定外のtool名
-                        print(f"Warning: Unexpected tool name '{tool_result.name}'")
-                        all_slides.append(Slide(
-                            title=msg_slide.title,
-                            bullets=[msg_slide.message_line, "詳細情報を元データから抽出してください"]
-                        ))
-            else:
-                # Toolsが使えない場合のフォールバック
-                print(f"Warning: Tools not used for slide '{msg_slide.title}', using fallback")
-                all_slides.append(Slide(
-                    title=msg_slide.title,
-                    bullets=[msg_slide.message_line, "詳細情報を元データから抽出してください"]
-                ))
+    if persist and _gen_disk_cache is not None:
+        _gen_disk_cache.set(key, [slide.model_dump() for slide in slides])
 
-        except Exception as e:
-            print(f"Body generation error for slide '{msg_slide.title}': {e}")
-            # エラー時はメッセージラインのみでスライドを作成
-            all_slides.append(Slide(
-                title=msg_slide.title,
-                bullets=[msg_slide.message_line]
-            ))
 
-    return all_slides
+@functools.lru_cache(maxsize=None)
+def _get_embedding_model():
+    """埋め込みモデルを初回利用時にロード"""
+    return SentenceTransformer(SEMANTIC_CACHE_MODEL)
 
 
-async def generate_slides_with_llm(sections: List[Section]) -> List[Slide]:
+def _embed_sections(sections: List[Section]):
     """
-    LLMを使用してスライド構成を生成（2段階アプローチ）
-    Step1: メッセージライン生成
-    Step2: Skills機能でボディ生成
+    入力セクションを正規化済みベクトルに変換（スレッドで実行する想定）
+    モデルの最大入力長を超える場合は後半が切り捨てられ、別の入力と誤ってヒットしうるためNoneを返す
     """
-    # Step1: メッセージラインを生成
-    message_line_slides = await generate_message_lines(sections)
-    
-    # Step2: メッセージラインと元データからボディを生成
-    slides = await generate_slide_bodies_with_skills(message_line_slides, sections)
-    
-    return slides
+    sections_text = format_sections(sections)
+    model = _get_embedding_model()
+    if len(model.tokenizer(sections_text)["input_ids"]) > model.max_seq_length:
+        return None
+    return model.encode([sections_text], normalize_embeddings=True)[0].astype(np.float32)
+
+
+def _semantic_lookup(query, titles: List[str]) -> Optional[List[Slide]]:
+    """セクションのタイトルが一致し、コサイン類似度が閾値を超える最近傍のスライドを返す"""
+    global _sem_clock
+    if _sem_embeddings is None or not _sem_slides:
+        return None
+
+    scores = _sem_embeddings @ query
+    best = None
+    for idx in np.flatnonzero(scores >= SEMANTIC_CACHE_THRESHOLD):
+        if _sem_titles[idx] == titles and (best is None or scores[idx] > scores[best]):
+            best = int(idx)
+    if best is None:
+        return None
+
+    _sem_clock += 1
+    _sem_last_used[best] = _sem_clock
+    return _SLIDE_LIST.validate_python(_sem_slides[best])
+
+
+def _semantic_insert(query, titles: List[str], slides: List[Slide]) -> None:
+    """意味的キャッシュに追加（上限に達したら最も長く参照されていない行を置き換える）"""
+    global _sem_embeddings, _sem_clock
+    _sem_clock += 1
+    slides_data = [slide.model_dump() for slide in slides]
+
+    if _sem_embeddings is None:
+        _sem_embeddings = query[np.newaxis, :]
+        _sem_titles.append(titles)
+        _sem_slides.append(slides_data)
+        _sem_last_used.append(_sem_clock)
+    elif len(_sem_slides) < SEMANTIC_CACHE_MAX:
+        _sem_embeddings = np.vstack([_sem_embeddings, query])
+        _sem_titles.append(titles)
+        _sem_slides.append(slides_data)
+        _sem_last_used.append(_sem_clock)
+    else:
+        victim = int(np.argmin(_sem_last_used))
+        _sem_embeddings[victim] = query
+        _sem_titles[victim] = titles
+        _sem_slides[victim] = slides_data
+        _sem_last_used[victim] = _sem_clock
+
+
+def _load_semantic_cache() -> None:
+    """保存済みの意味的キャッシュを読み込む"""
+    global _sem_embeddings, _sem_titles, _sem_slides, _sem_last_used
+    if not SEMANTIC_CACHE_ENABLED:
+        return
+
+    embeddings_path = os.path.join(SEMANTIC_CACHE_DIR, "embeddings.npy")
+    entries_path = os.path.join(SEMANTIC_CACHE_DIR, "entries.json")
+    if not (os.path.exists(embeddings_path) and os.path.exists(entries_path)):
+        return
+
+    try:
+        embeddings = np.load(embeddings_path)
+        with open(entries_path, "rb") as f:
+            entries = orjson.loads(f.read())
+        if len(embeddings) == len(entries):
+            _sem_embeddings = embeddings
+            _sem_titles = [entry["titles"] for entry in entries]
+            _sem_slides = [entry["slides"] for entry in entries]
+            _sem_last_used = [0] * len(entries)
+    except Exception as e:
+        print(f"Warning: Semantic cache load failed: {e}")
+
 
+def _save_semantic_cache() -> None:
+    """意味的キャッシュをディスクに保存"""
+    if not SEMANTIC_CACHE_ENABLED or _sem_embeddings is None:
+        return
 
-@app.post("/generate")
-async def generate_slides(request: GenerateRequest) -> SlidesState:
+    try:
+        os.makedirs(SEMANTIC_CACHE_DIR, exist_ok=True)
+        np.save(os.path.join(SEMANTIC_CACHE_DIR, "embeddings.npy"), _sem_embeddings)
+        entries = [
+            {"titles": titles, "slides": slides_data}
+            for titles, slides_data in zip(_sem_titles, _sem_slides)
+        ]
+        with open(os.path.join(SEMANTIC_CACHE_DIR, "entries.json"), "wb") as f:
+            f.write(orjson.dumps(entries))
+    except Exception as e:
+        print(f"Warning: Semantic cache save failed: {e}")
+
+
+def _slides_response(slides: List[Slide]) -> Response:
+    """
+    スライド配列をレスポンスとして返す
+    Slideは生成時にバリデーション済みのため、再検証せずpydantic-coreで直接JSONに変換する
+    """
+    return Response(
+        content=SlidesState.model_construct(slides=slides).model_dump_json(),
+        media_type="application/json"
+    )
+
+
+@app.post("/generate", response_model=None, responses={200: {"model": SlidesState}})
+async def generate_slides(request: GenerateRequest) -> Response:
     """
     ES入力から構成案を生成（LLMのみ使用）
     """
@@ -293,39 +762,75 @@ async def generate_slides(request: GenerateRequest) -> SlidesState:
             detail="Anthropic API キーが設定されていません。.envファイルにANTHROPIC_API_KEYを設定してください。"
         )
 
-    slides = await generate_slides_with_llm(request.sections)
-    return SlidesState(slides=slides)
+    key = _generate_cache_key(request.sections)
+    cached = _get_cached_slides(key)
+    if cached is not None:
+        return _slides_response(cached)
+
+    query = None
+    titles = [section.title for section in request.sections]
+    if SEMANTIC_CACHE_ENABLED:
+        try:
+            # 入力が長すぎる場合はNone（意味的キャッシュを使わない）
+            query = await asyncio.to_thread(_embed_sections, request.sections)
+            cached = _semantic_lookup(query, titles) if query is not None else None
+            if cached is not None:
+                _set_cached_slides(key, cached)
+                return _slides_response(cached)
+        except Exception as e:
+            print(f"Warning: Semantic cache lookup failed: {e}")
+
+    slides, complete = await generate_slides_with_llm(request.sections)
+
+    # 一部のスライドがフォールバックになった結果はキャッシュしない（再送信で作り直せるように）
+    if complete:
+        _set_cached_slides(key, slides)
+        if query is not None:
+            _semantic_insert(query, titles, slides)
+    return _slides_response(slides)
+
+
+# /patch のプロンプトから操作を判定するキーワード（グループ名が操作の種類）
+_PATCH_INTENT_RE = re.compile(
+    r"(?P<delete>削除|消して|delete)"
+    r"|(?P<add>追加|add)"
+    r"|(?P<title>タイトル)"
+    r"|(?P<change>変更)"
+    r"|(?P<bullet>箇条書き|内容)"
+)
 
 
-@app.post("/patch")
-async def patch_slides(request: PatchRequest) -> SlidesState:
+@app.post("/patch", response_model=None, responses={200: {"model": SlidesState}})
+async def patch_slides(request: PatchRequest) -> Response:
     """
     チャット入力でスライドを編集
     簡易実装：プロンプトに応じた操作を解析
     """
-    slides = request.slides.copy()
+    slides = [slide.model_copy(deep=True) for slide in request.slides]
     prompt = request.prompt.lower()
 
-    # プロンプト解析（簡易版）
-    if "削除" in prompt or "消して" in prompt or "delete" in prompt:
+    # プロンプト解析（簡易版）：キーワードを1回の走査でまとめて検出
+    intents = {match.lastgroup for match in _PATCH_INTENT_RE.finditer(prompt)}
+
+    if "delete" in intents:
         # 最後のスライドを削除（タイトル以外）
         if len(slides) > 1:
             slides.pop()
 
-    elif "追加" in prompt or "add" in prompt:
+    elif "add" in intents:
         # 新しいスライドを追加
         slides.append(Slide(
             title="新しいスライド",
             bullets=["内容を編集してください"]
         ))
 
-    elif "タイトル" in prompt and "変更" in prompt:
+    elif "title" in intents and "change" in intents:
         # 最初のスライドのタイトルを変更
         if slides and "→" in prompt:
             new_title = prompt.split("→")[1].strip()
             slides[0].title = new_title
 
-    elif "箇条書き" in prompt or "内容" in prompt:
+    elif "bullet" in intents:
         # 箇条書きを追加
         if len(slides) > 1:
             new_bullet = prompt.replace("箇条書き", "").replace("追加", "").strip()
@@ -337,55 +842,95 @@ async def patch_slides(request: PatchRequest) -> SlidesState:
         if slides:
             slides[-1].bullets.append(f"💡 {request.prompt}")
 
-    return SlidesState(slides=slides)
+    return _slides_response(slides)
+
+
+# python-pptxと同じく、改行以外の制御文字は _xHHHH_ 形式で書き込む
+_LINE_BREAK_RE = re.compile("\n|\v")
+_CTRL_CHAR_RE = re.compile("([\x00-\x08\x0B-\x1F])")
 
 
-async def create_pptx_with_skills(slides: List[Slide], filepath: str) -> None:
+def _paragraph_xml(text: str) -> str:
     """
-    Claude Skillsを使用してPPTXファイルを作成
+    箇条書き1項目分の<a:p>要素を生成
+    python-pptxの p.text と同様に、改行（\n・\v）は<a:br/>に変換し、空のランは作らない
+    """
+    parts = []
+    for i, line in enumerate(_LINE_BREAK_RE.split(text)):
+        if i > 0:
+            parts.append("<a:br/>")
+        if line:
+            line = _CTRL_CHAR_RE.sub(lambda m: "_x%04X_" % ord(m.group(1)), line)
+            parts.append(f"<a:r><a:t>{xml_escape(line)}</a:t></a:r>")
+    return f"<a:p>{''.join(parts)}</a:p>"
 
-    Args:
-        slides: スライドデータのリスト
-        filepath: 保存先ファイルパス
+
+def _fill_bullets(text_frame, bullets: List[str], first_bullet_bold: bool) -> None:
     """
-    # Skillsの定義：PPTX作成用の構造化出力スキーマ
-    pptx_creation_tool = {
-        "name": "create_powerpoint_file",
-        "description": "スライドデータからPowerPointファイルを作成する指示を生成",
-        "input_schema": {
-            "type": "object",
-            "properties": {
-                "slides_config": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "title": {"type": "string", "description": "スライドのタイトル"},
-                            "bullets": {
-                                "type": "array",
-                                "items": {"type": "string"},
-                                "description": "箇条書き項目のリスト（1つ目は太字のメッセージライン）"
-                            }
-                        },
-                        "required": ["title", "bullets"]
+    テキストフレームに箇条書きを設定
+
+    2項目目以降は<a:p>要素をまとめて1回でパースし、末尾に追加する
+    （add_paragraph()を項目ごとに呼ぶよりXMLツリー操作が少ない）
+    """
+    text_frame.clear()
+    text_frame.paragraphs[0].text = bullets[0]
+    if first_bullet_bold and text_frame.paragraphs[0].runs:
+        text_frame.paragraphs[0].runs[0].font.bold = True
+
+    if len(bullets) > 1:
+        paragraphs = "".join(_paragraph_xml(bullet) for bullet in bullets[1:])
+        fragment = parse_xml(f"<a:txBody {nsdecls('a')}>{paragraphs}</a:txBody>")
+        text_frame._txBody.extend(list(fragment))
+
+
+# PPTX書き込み時のバッファサイズ
+PPTX_WRITE_BUFFER_SIZE = 1024 * 1024
+PPTX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+
+def _save_pptx(prs: Presentation, filepath: str) -> None:
+    """大きめのバッファでPPTXファイルを書き込む（スレッドで実行する想定、既存ファイルは上書きしない）"""
+    with open(filepath, "xb", buffering=PPTX_WRITE_BUFFER_SIZE) as f:
+        prs.save(f)
+
+
+# Skillsの定義：PPTX作成用の構造化出力スキーマ
+PPTX_CREATION_TOOL = {
+    "name": "create_powerpoint_file",
+    "description": "スライドデータからPowerPointファイルを作成する指示を生成",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "slides_config": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "title": {"type": "string", "description": "スライドのタイトル"},
+                        "bullets": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "箇条書き項目のリスト（1つ目は太字のメッセージライン）"
+                        }
                     },
-                    "description": "各スライドの設定情報"
+                    "required": ["title", "bullets"]
                 },
-                "slide_width_inches": {"type": "number", "description": "スライド幅（インチ）"},
-                "slide_height_inches": {"type": "number", "description": "スライド高さ（インチ）"},
-                "first_bullet_bold": {"type": "boolean", "description": "1つ目の箇条書きを太字にするか"}
+                "description": "各スライドの設定情報"
             },
-            "required": ["slides_config", "slide_width_inches", "slide_height_inches", "first_bullet_bold"]
-        }
+            "slide_width_inches": {"type": "number", "description": "スライド幅（インチ）"},
+            "slide_height_inches": {"type": "number", "description": "スライド高さ（インチ）"},
+            "first_bullet_bold": {"type": "boolean", "description": "1つ目の箇条書きを太字にするか"}
+        },
+        "required": ["slides_config", "slide_width_inches", "slide_height_inches", "first_bullet_bold"]
     }
+}
 
-    # スライドデータをJSON形式に変換
-    slides_json = [{"title": s.title, "bullets": s.bullets} for s in slides]
 
-    prompt = f"""以下のスライドデータからPowerPointファイルを作成する設定を生成してください。
+# PPTX設定生成用のプロンプトテンプレート
+PPTX_CONFIG_PROMPT_TEMPLATE = """以下のスライドデータからPowerPointファイルを作成する設定を生成してください。
 
 # スライドデータ
-{json.dumps(slides_json, ensure_ascii=False, indent=2)}
+{slides_json}
 
 # 要件
 - スライドサイズ: 幅10インチ × 高さ7.5インチ
@@ -394,14 +939,32 @@ async def create_pptx_with_skills(slides: List[Slide], filepath: str) -> None:
 
 create_powerpoint_fileツールを使用して設定を生成してください。"""
 
+
+async def create_pptx_with_skills(slides: List[Slide]) -> Presentation:
+    """
+    Claude Skillsを使用してPPTXを作成
+
+    Args:
+        slides: スライドデータのリスト
+
+    Returns:
+        Presentation: 作成したプレゼンテーションオブジェクト（保存は呼び出し側で行う）
+    """
+    # スライドデータをJSON形式に変換
+    slides_json = [{"title": s.title, "bullets": s.bullets} for s in slides]
+
+    prompt = PPTX_CONFIG_PROMPT_TEMPLATE.format(
+        slides_json=orjson.dumps(slides_json, option=orjson.OPT_INDENT_2).decode()
+    )
+
     try:
-        response = anthropic_client.messages.create(
+        response = await anthropic_client.messages.create(
             model="claude-sonnet-4-20250514",
             max_tokens=4000,
             messages=[
                 {"role": "user", "content": prompt}
             ],
-            tools=[pptx_creation_tool],
+            tools=[PPTX_CREATION_TOOL],
             tool_choice={"type": "tool", "name": "create_powerpoint_file"}
         )
 
@@ -420,8 +983,8 @@ create_powerpoint_fileツールを使用して設定を生成してください
                     slides_config = config.get("slides_config", slides_json)
                     first_bullet_bold = config.get("first_bullet_bold", True)
 
+                    slide_layout = prs.slide_layouts[1]
                     for slide_data in slides_config:
-                        slide_layout = prs.slide_layouts[1]
                         slide = prs.slides.add_slide(slide_layout)
 
                         # タイトル設定
@@ -432,22 +995,9 @@ create_powerpoint_fileツールを使用して設定を生成してください
                         bullets = slide_data.get("bullets", [])
                         if bullets:
                             body = slide.placeholders[1]
-                            text_frame = body.text_frame
-                            text_frame.clear()
-
-                            for i, bullet in enumerate(bullets):
-                                if i == 0:
-                                    text_frame.text = bullet
-                                    if first_bullet_bold and text_frame.paragraphs[0].runs:
-                                        run = text_frame.paragraphs[0].runs[0]
-                                        run.font.bold = True
-                                else:
-                                    p = text_frame.add_paragraph()
-                                    p.text = bullet
-                                    p.level = 0
-
-                    prs.save(filepath)
-                    return
+                            _fill_bullets(body.text_frame, bullets, first_bullet_bold)
+
+                    return prs
 
         # フォールバック: Skillsが使えない場合は直接作成
         print("Warning: Skills not used for PPTX creation, using fallback")
@@ -455,8 +1005,8 @@ create_powerpoint_fileツールを使用して設定を生成してください
         prs.slide_width = Inches(10)
         prs.slide_height = Inches(7.5)
 
+        slide_layout = prs.slide_layouts[1]
         for slide_data in slides:
-            slide_layout = prs.slide_layouts[1]
             slide = prs.slides.add_slide(slide_layout)
 
             title = slide.shapes.title
@@ -464,21 +1014,9 @@ create_powerpoint_fileツールを使用して設定を生成してください
 
             if slide_data.bullets:
                 body = slide.placeholders[1]
-                text_frame = body.text_frame
-                text_frame.clear()
-
-                for i, bullet in enumerate(slide_data.bullets):
-                    if i == 0:
-                        text_frame.text = bullet
-                        if text_frame.paragraphs[0].runs:
-                            run = text_frame.paragraphs[0].runs[0]
-                            run.font.bold = True
-                    else:
-                        p = text_frame.add_paragraph()
-                        p.text = bullet
-                        p.level = 0
-
-        prs.save(filepath)
+                _fill_bullets(body.text_frame, slide_data.bullets, True)
+
+        return prs
 
     except Exception as e:
         print(f"PPTX creation error: {e}")
@@ -488,20 +1026,107 @@ create_powerpoint_fileツールを使用して設定を生成してください
         )
 
 
+def _next_export_id() -> str:
+    """エクスポートファイル用の短いIDを生成（base32・10文字）"""
+    packed = struct.pack(">IH", next(_export_counter) & 0xFFFFFFFF, _export_pid_suffix)
+    return base64.b32encode(packed).decode().rstrip("=").lower()
+
+
+def _parse_export_counter(filename: str) -> Optional[int]:
+    """エクスポートファイル名から連番部分を取り出す（形式が違う場合はNone）"""
+    match = _EXPORT_FILENAME_RE.fullmatch(filename)
+    if not match:
+        return None
+    packed = base64.b32decode(match.group(1).upper() + "======")
+    return struct.unpack(">IH", packed)[0]
+
+
+def _new_export_filename() -> str:
+    """既存ファイルと重ならないエクスポートファイル名を生成"""
+    while True:
+        filename = f"slide_{_next_export_id()}.pptx"
+        if filename not in _export_lru and not os.path.exists(os.path.join(EXPORT_DIR, filename)):
+            return filename
+
 
+def _write_file(filepath: str, data: bytes) -> None:
+    """メモリ上で生成したファイルをディスクに書き込む（既存ファイルは上書きしない）"""
+    with open(filepath, "xb", buffering=PPTX_WRITE_BUFFER_SIZE) as f:
+        f.write(data)
 
 
-@app.post("/export")
-async def export_pptx(request: ExportRequest) -> dict:
+async def _write_export_in_background(filename: str, data: bytes) -> None:
+    """エクスポートファイルを書き込んで保持対象に登録（バックグラウンドタスク用）"""
+    await asyncio.to_thread(_write_file, os.path.join(EXPORT_DIR, filename), data)
+    await _register_export(filename)
+
+
+async def _register_export(filename: str) -> None:
+    """エクスポートファイルを登録し、上限を超えた古いファイルを削除"""
+    async with _export_lock:
+        _export_lru[filename] = time.time()
+        _export_lru.move_to_end(filename)
+        while len(_export_lru) > EXPORT_MAX_FILES:
+            old, _ = _export_lru.popitem(last=False)
+            try:
+                os.unlink(os.path.join(EXPORT_DIR, old))
+            except FileNotFoundError:
+                pass
+
+
+def _load_export_index() -> None:
+    """
+    既存のエクスポートファイル（slide_<ID>.pptx）を更新日時順に登録
+    再起動前に払い出したIDと重ならないよう、連番は既存ファイルの最大値より後から始める
+    """
+    global _export_counter
+    entries = sorted(
+        (entry for entry in os.scandir(EXPORT_DIR) if entry.is_file()),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    last_counter = -1
+    for entry in entries:
+        # このアプリが出力したファイル以外（.gitkeep や手動で置いたファイル）は削除対象にしない
+        counter = _parse_export_counter(entry.name)
+        if counter is None:
+            continue
+        _export_lru[entry.name] = entry.stat().st_mtime
+        last_counter = max(last_counter, counter)
+
+    _export_counter = itertools.count(max(int(time.time()), last_counter + 1))
+
+
+@app.post("/export", response_model=None)
+async def export_pptx(
+    request: ExportRequest,
+    background_tasks: BackgroundTasks,
+    inline: bool = False
+) -> Union[dict, Response]:
     """
     PPTXファイルを生成してダウンロードURLを返す
+    inline=1 の場合はメモリ上で生成したファイルをそのまま返し、
+    ディスクへの保存はレスポンス送信後にバックグラウンドで行う
     """
+    # Claude Skillsを使ってPPTX作成
+    prs = await create_pptx_with_skills(request.slides)
+
     # ファイル名生成
-    filename = f"slide_{uuid.uuid4().hex[:8]}.pptx"
+    filename = _new_export_filename()
     filepath = os.path.join(EXPORT_DIR, filename)
 
-    # Claude Skillsを使ってPPTX作成
-    await create_pptx_with_skills(request.slides, filepath)
+    if inline:
+        buf = io.BytesIO()
+        await asyncio.to_thread(prs.save, buf)
+        data = buf.getvalue()
+        background_tasks.add_task(_write_export_in_background, filename, data)
+        return Response(
+            content=data,
+            media_type=PPTX_MEDIA_TYPE,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+
+    await asyncio.to_thread(_save_pptx, prs, filepath)
+    await _register_export(filename)
 
     return {
         "download_url": f"/download/{filename}",
@@ -519,9 +1144,12 @@ async def download_file(filename: str):
     if not os.path.exists(filepath):
         raise HTTPException(status_code=404, detail="ファイルが見つかりません")
 
+    if filename in _export_lru:
+        _export_lru.move_to_end(filename)
+
     return FileResponse(
         filepath,
-        media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+        media_type=PPTX_MEDIA_TYPE,
         filename=filename
     )
 